@@ -30,12 +30,13 @@ Stock-ID, Timestamp-n+3, stock price n+3
 """
 import logging
 import argparse
-import glob
+import csv
 import os
 import itertools
-from collections import defaultdict
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from random import randrange
 from datetime import datetime, timedelta
 
 from predictor import BasicPredictor
@@ -43,103 +44,234 @@ from predictor import BasicPredictor
 APP_NAME = "Stock-Predictor"
 DATA_DIRECTORY_DEFAULT = "data/"
 INPUT_FILE_COUNT_DEFAULT = 2
+WINDOW_COUNT_DEFAULT = 1
 PREDICTION_DATA_POINTS = 10
 DATE_FORMAT = '%d-%m-%Y'
+COUNT_ROWS_CHUNK_SIZE = 1024 * 1024
+READ_CHUNK_ROWS = 100_000
+WRITE_QUEUE_SIZE = 4
+CSV_COLUMNS = ["Ticker", "Timestamp", "Value"]
+CSV_SCHEMA = {"Timestamp": str, "Value": "float64"}
 TIMESTAMP = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+BASIC_PREDICTION_SUFFIX = f'_BasicPrediction_{TIMESTAMP}'
 
 logger = logging.getLogger(__name__)
 
+_WRITE_POOL = ThreadPoolExecutor(max_workers=2)
+_WRITE_SLOTS = threading.BoundedSemaphore(WRITE_QUEUE_SIZE)
+
 def _validate_arguments(args):
     if args.input_file_count < 1 or args.input_file_count > 2:
         return (False, f"Invalid file count [1-2]: {args.input_file_count}") 
 
-    if args.data_directory_path:
-        if not os.path.exists(args.data_directory_path):
-            return (False), f"Data directory not found: {args.data_directory_path}"
-    
-    return (True, f"Arguments are valid: {args}") 
-
-def _read_csv_files_from_data(data_directory):
-    return glob.iglob(f"{data_directory}**/*.csv", recursive=True)
-        
-def _filter_csv_list(csv_list, data_directory, input_file_count):
-    dd_length = len(data_directory)
-    _exchange_stock_dict = defaultdict(list)
-    
-    # Ignore CSV files not following structure
-    for _csv in csv_list:
-        path_within_dd = _csv[dd_length:]
-        path_parts = path_within_dd.split(os.sep)
-
-        if len(path_parts) != 2:
-            logger.debug(f"Skipping CSV not following path structure: {_csv}")
-            continue
-        
-        exchange, csv_filename = path_parts 
-        if "Prediction_" in csv_filename:
-            continue
-        _exchange_stock_dict[exchange].append(_csv)
-    
-    for _exchange, _csv_list in _exchange_stock_dict.items():
-        _exchange_stock_dict[_exchange] = _exchange_stock_dict[_exchange][:input_file_count]
-
-    new_csv_list = _exchange_stock_dict.values()
-    new_csv_list = list(itertools.chain.from_iterable(new_csv_list))
+    if args.window_count < 1:
+        return (False, f"Invalid window count [>=1]: {args.window_count}")
 
-    return new_csv_list
+    if not os.path.isdir(args.data_directory_path):
+        return (False, f"Data directory not found: {args.data_directory_path}")
+    
+    # The success message is only built when it would be logged
+    return (True, None)
+
+def _validate_timestamp_format(timestamps):
+    # Only the given rows are parsed, the rest are assumed to follow them
+    for timestamp in timestamps:
+        try:
+            datetime.strptime(timestamp, DATE_FORMAT)
+        except ValueError:
+            return (False, f"Invalid timestamp format [{DATE_FORMAT}]: {timestamp}")
+
+    return (True, f"Timestamp format is valid: {timestamps[0]}")
+
+def _read_csv_files_from_data(data_directory, input_file_count):
+    # Only <data_directory>/<exchange>/<stock>.csv files follow the structure,
+    # so the walk stops at the second level
+    with os.scandir(data_directory) as exchange_entries:
+        for exchange_entry in exchange_entries:
+            if not exchange_entry.is_dir():
+                continue
+            yield from _read_exchange_csv_files(exchange_entry.path, input_file_count)
+
+def _read_exchange_csv_files(exchange_directory, input_file_count):
+    exchange_file_count = 0
+    with os.scandir(exchange_directory) as csv_entries:
+        for csv_entry in csv_entries:
+            if exchange_file_count >= input_file_count:
+                break
+
+            csv_filename = csv_entry.name
+            if not csv_filename.endswith(".csv") or "Prediction_" in csv_filename:
+                continue
+            # is_file() uses the entry type cached by scandir, no extra stat call
+            if not csv_entry.is_file():
+                logger.debug(f"Skipping CSV not following path structure: {csv_entry.path}")
+                continue
+
+            exchange_file_count += 1
+            yield csv_entry.path
+
+def _count_rows(csv_path):
+    # Counting line breaks is much cheaper than parsing the whole file.
+    # read_csv skips blank lines, so trailing ones are not counted as rows
+    line_break_count = 0
+    trailing_line_break_count = 0
+    has_content = False
+    with open(csv_path, 'rb') as csv_file:
+        while chunk := csv_file.read(COUNT_ROWS_CHUNK_SIZE):
+            line_break_count += chunk.count(b"\n")
+            content = chunk.rstrip()
+            if content:
+                has_content = True
+                trailing_line_break_count = chunk[len(content):].count(b"\n")
+            else:
+                trailing_line_break_count += chunk.count(b"\n")
+
+    if not has_content:
+        return 0
+
+    # Every line break before the last row separates two rows
+    return line_break_count - trailing_line_break_count + 1
+
+def _get_ticker(csv_path):
+    # Files are named after their stock, e.g. data/LSE/GSK.csv
+    return os.path.splitext(os.path.basename(csv_path))[0]
 
 # Requirement 1
-def extract_stock_data_subset(stock_data_df):
-    stock_data_size = len(stock_data_df)
-
-    random_df_position = randrange(0, stock_data_size - PREDICTION_DATA_POINTS)
-    stock_data_subset = stock_data_df.iloc[
-        random_df_position:random_df_position + PREDICTION_DATA_POINTS
-    ].copy()
-    stock_data_subset.reset_index(drop=True, inplace=True)
-    
-    return stock_data_subset
+def extract_stock_data_subset(csv_path, stock_data_size, window_count=1):
+    rng = np.random.default_rng()
+    window_positions = rng.integers(
+        0, stock_data_size - PREDICTION_DATA_POINTS + 1, size=window_count
+    )
+    first_position = int(window_positions.min())
+    last_position = int(window_positions.max()) + PREDICTION_DATA_POINTS
+
+    # Rows used by the windows, relative to the first sampled row
+    window_indices = (
+        (window_positions - first_position)[:, np.newaxis]
+        + np.arange(PREDICTION_DATA_POINTS)
+    )
+    needed_positions = np.unique(window_indices)
+
+    # Only the rows covering the sampled windows are parsed, the rows
+    # before them are skipped. The span is read in chunks keeping only the
+    # needed rows, so memory doesn't grow with the file size.
+    # Timestamps are kept as the original strings, so the output
+    # has the same format as the input file.
+    # The ticker is taken from the file name, so its column is not read
+    timestamp_parts = []
+    value_parts = []
+    chunk_start = 0
+    with pd.read_csv(
+        csv_path,
+        header=None, names=CSV_COLUMNS[1:], usecols=[1, 2],
+        dtype=CSV_SCHEMA,
+        skiprows=first_position, nrows=last_position - first_position,
+        chunksize=READ_CHUNK_ROWS
+    ) as stock_data_reader:
+        for stock_data_chunk in stock_data_reader:
+            chunk_end = chunk_start + len(stock_data_chunk)
+            (needed_start, needed_end) = np.searchsorted(
+                needed_positions, [chunk_start, chunk_end]
+            )
+            chunk_rows = needed_positions[needed_start:needed_end] - chunk_start
+            timestamp_parts.append(stock_data_chunk['Timestamp'].to_numpy()[chunk_rows])
+            value_parts.append(stock_data_chunk['Value'].to_numpy()[chunk_rows])
+            chunk_start = chunk_end
+
+    # Blank lines inside the file are skipped by read_csv but still
+    # counted by _count_rows, so fewer rows than expected can come back
+    if chunk_start != last_position - first_position:
+        return None
+
+    # All windows are gathered at once into (window_count, 10) arrays
+    kept_indices = np.searchsorted(needed_positions, window_indices)
+    timestamp_windows = np.concatenate(timestamp_parts)[kept_indices]
+    value_windows = np.concatenate(value_parts)[kept_indices]
+
+    return (timestamp_windows, value_windows)
+
+def prepare_prediction_timestamps(last_timestamp, prediction_length):
+    first_prediction_dt = datetime.strptime(last_timestamp, DATE_FORMAT) + timedelta(days=1)
+    return pd.date_range(
+        first_prediction_dt, periods=prediction_length, freq='D'
+    ).strftime(DATE_FORMAT).tolist()
+
+def _write_prediction_csv(bp_csv_path, ticker, timestamps, values,
+                          prediction_timestamps, prediction):
+    # Rows are written straight from the sampled and predicted values,
+    # no output DataFrame is built
+    with open(bp_csv_path, 'w', newline='') as bp_csv_file:
+        writer = csv.writer(bp_csv_file, lineterminator='\n')
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(zip(itertools.repeat(ticker), timestamps, values))
+        writer.writerows(zip(itertools.repeat(ticker), prediction_timestamps, prediction))
+
+def _on_prediction_csv_written(future):
+    _WRITE_SLOTS.release()
+    if future.exception() is not None:
+        logger.error(f"Failed to write prediction CSV: {future.exception()}")
+
+def _submit_prediction_csv(prediction_csv):
+    # Blocks once WRITE_QUEUE_SIZE writes are pending, so results
+    # don't pile up in memory if writing falls behind
+    _WRITE_SLOTS.acquire()
+    future = _WRITE_POOL.submit(_write_prediction_csv, *prediction_csv)
+    future.add_done_callback(_on_prediction_csv_written)
 
 # Requirement 2
-def prepare_prediction_df(stock_data_subset, prediction):
-    prediction_length = len(prediction)
-
-    last_timestamp = stock_data_subset['Timestamp'].iloc[-1]
-    last_timestamp_dt = datetime.strptime(last_timestamp, DATE_FORMAT)
-    new_timestamps = []
-    new_tickers = []
-    for i in range(prediction_length):
-        next_timestamp = last_timestamp_dt + timedelta(days=i+1)
-        new_timestamps.append(next_timestamp.strftime(DATE_FORMAT))
-        new_tickers.append(stock_data_subset['Ticker'].iloc[0])
-
-    prediction_df = pd.DataFrame({
-        "Ticker": new_tickers,
-        "Timestamp": new_timestamps,
-        "Value": prediction
-    },  index=None)
-    
-    final_result_df = pd.concat(
-        [stock_data_subset, prediction_df], 
-        axis=0
+def generate_basic_prediction(csv_path, ticker, stock_data_subset, output_suffix):
+    (timestamp_windows, value_windows) = stock_data_subset
+    basic_predictor = BasicPredictor(
+        input_data_df=value_windows
     )
+    predictions = basic_predictor.predict()
+
+    window_count = len(value_windows)
+    # Input paths always end in .csv, see _read_exchange_csv_files
+    bp_csv_base = csv_path[:-4] + output_suffix
+    prediction_csvs = []
+    for window_index in range(window_count):
+        timestamps = timestamp_windows[window_index].tolist()
+        prediction = predictions[window_index].tolist()
+        prediction_timestamps = prepare_prediction_timestamps(
+            timestamps[-1], len(prediction)
+        )
 
-    return final_result_df
+        window_suffix = f'_{window_index + 1}' if window_count > 1 else ''
+        bp_csv_path = f'{bp_csv_base}{window_suffix}.csv'
+        prediction_csvs.append((
+            bp_csv_path, ticker,
+            timestamps, value_windows[window_index].tolist(),
+            prediction_timestamps, prediction
+        ))
 
-def generate_basic_prediction(csv_path, stock_data_df):
-    stock_data_subset = extract_stock_data_subset(stock_data_df)
+    # Arguments for _write_prediction_csv, one entry per output file
+    return prediction_csvs
 
-    basic_predictor = BasicPredictor(
-        input_data_df=stock_data_subset["Value"]
+def process_one(csv_path, output_suffix, window_count=1):
+    stock_data_size = _count_rows(csv_path)
+    if stock_data_size < PREDICTION_DATA_POINTS:
+        return (False, f"{csv_path}: CSV File doesn't have enough data points", [])
+
+    stock_data_subset = extract_stock_data_subset(
+        csv_path, stock_data_size, window_count
     )
-    prediction = basic_predictor.predict()
+    if stock_data_subset is None:
+        return (False, f"{csv_path}: CSV File has fewer data points than counted", [])
+    # The last timestamp of each window is the one parsed to build the
+    # prediction timestamps, so it is checked along with the first row
+    (timestamp_windows, _) = stock_data_subset
+    (valid, message) = _validate_timestamp_format(
+        [timestamp_windows[0, 0], *timestamp_windows[:, -1]]
+    )
+    if not valid:
+        return (False, f"{csv_path}: {message}", [])
 
-    result_df = prepare_prediction_df(stock_data_subset, prediction)
-    bp_csv_path = csv_path.replace(
-        '.csv',
-        f'_BasicPrediction_{TIMESTAMP}.csv'
+    ticker = _get_ticker(csv_path)
+    prediction_csvs = generate_basic_prediction(
+        csv_path, ticker, stock_data_subset, output_suffix
     )
-    result_df.to_csv(bp_csv_path, index=False)
+    return (True, f"Prediction done for {csv_path}", prediction_csvs)
 
 # def generate_numpy_prediction(csv_path, stock_data_df):
 #     stock_data_subset = extract_stock_data_subset(stock_data_df)
@@ -168,6 +300,9 @@ def app():
             logging.StreamHandler()
         ]
     )
+    # numba logs every compilation step at DEBUG level, which would flood
+    # the application log whenever the kernel cache is rebuilt
+    logging.getLogger("numba").setLevel(logging.WARNING)
 
     parser = argparse.ArgumentParser(
         prog=APP_NAME,
@@ -184,47 +319,56 @@ def app():
         default=DATA_DIRECTORY_DEFAULT, const=DATA_DIRECTORY_DEFAULT, nargs='?',
         help='Path of data directory, containing CSV files'
     )
+    parser.add_argument(
+        '--window_count', type=int,
+        default=WINDOW_COUNT_DEFAULT, const=WINDOW_COUNT_DEFAULT, nargs='?',
+        help='Number of random windows to predict from each file'
+    )
 
     args = parser.parse_args()
     (valid, message) = _validate_arguments(args)
     if not valid:
         logger.error(message)
         return 
-    else:
-        logger.debug(message)
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Arguments are valid: {args}")
 
     data_directory_path = args.data_directory_path
     input_file_count = args.input_file_count
+    window_count = args.window_count
 
-    csv_list = _read_csv_files_from_data(
-        data_directory=data_directory_path
-    )
-    csv_list = _filter_csv_list(
-        csv_list=csv_list,
-        data_directory=data_directory_path ,
+    csv_list = list(_read_csv_files_from_data(
+        data_directory=data_directory_path,
         input_file_count=input_file_count
-    )
+    ))
 
     if csv_list:
         logger.info(f"Valid CSV files found")
     
     for _csv in csv_list:
         logger.info(f"Running prediction for {_csv}...")
-        stock_data_df = pd.read_csv(
-            _csv, 
-            header=None, names=["Ticker", "Timestamp", "Value"]
+
+    # Files are independent of each other, so they are processed in parallel.
+    # The suffix is passed explicitly so all workers share the same one,
+    # even if they re-import the module and get their own TIMESTAMP
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(
+            process_one, csv_list,
+            itertools.repeat(BASIC_PREDICTION_SUFFIX), itertools.repeat(window_count)
         )
-        stock_data_df['Timestamp'] = pd.to_datetime(
-            stock_data_df['Timestamp'],
-            format=DATE_FORMAT
-        ).dt.strftime(DATE_FORMAT)
-    
-        stock_data_size = len(stock_data_df)
-        if stock_data_size < PREDICTION_DATA_POINTS:
-            logger.error("CSV File doesn't have enough data points")
-    
-        generate_basic_prediction(_csv, stock_data_df)
-        
+        # Outputs are written by the I/O threads of this process,
+        # while the workers move on to the next files
+        for (success, message, prediction_csvs) in results:
+            if success:
+                logger.info(message)
+            else:
+                logger.error(message)
+
+            for prediction_csv in prediction_csvs:
+                _submit_prediction_csv(prediction_csv)
+
+    _WRITE_POOL.shutdown(wait=True)
+
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -1,5 +1,59 @@
 from abc import ABC, abstractmethod
-import pandas as pd
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, the NumPy implementation is used without it
+    njit = None
+
+def _basic_prediction_numpy(windows):
+    last_values = windows[:, -1]
+
+    # Selection instead of a full sort, only the top 2 values are needed.
+    # np.partition sorts NaN last, so missing values are masked to keep
+    # them out of the top 2, like the loop implementation does
+    p1 = np.partition(
+        np.where(np.isnan(windows), -np.inf, windows), -2, axis=1
+    )[:, -2]
+    p2 = p1 + (p1 - last_values) / 2
+    p3 = p2 + (p2 - p1) / 4
+
+    return np.column_stack((p1, p2, p3))
+
+def _basic_prediction_loop(windows):
+    predictions = np.empty((windows.shape[0], 3))
+    for window_index in range(windows.shape[0]):
+        window = windows[window_index]
+        last_value = window[-1]
+
+        # Single pass tracking the 2 highest values, a repeated maximum
+        # counts as the second highest as well. Written with min/max only,
+        # so the compiled loop has no branches
+        highest_value = -np.inf
+        second_highest_value = -np.inf
+        for value in window:
+            second_highest_value = max(second_highest_value, min(value, highest_value))
+            highest_value = max(highest_value, value)
+
+        p1 = second_highest_value
+        p2 = p1 + (p1 - last_value) / 2
+        p3 = p2 + (p2 - p1) / 4
+
+        predictions[window_index, 0] = p1
+        predictions[window_index, 1] = p2
+        predictions[window_index, 2] = p3
+
+    return predictions
+
+# The loop only pays off once compiled, the cache keeps the compiled
+# kernel on disk between runs. fastmath leaves out the no-NaN/no-inf
+# flags, the loop starts from -inf and windows can contain NaN
+FASTMATH_FLAGS = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+if njit is not None:
+    _basic_prediction = njit(cache=True, fastmath=FASTMATH_FLAGS)(_basic_prediction_loop)
+else:
+    _basic_prediction = _basic_prediction_numpy
 
 class Predictor(ABC):
     @abstractmethod
@@ -8,32 +62,15 @@ class Predictor(ABC):
 
 class BasicPredictor(Predictor):
     def __init__(self, input_data_df):
-        self.input_data_df = input_data_df
+        # A single window is treated as a batch of one,
+        # shaped (window_count, data_points)
+        self.windows = np.atleast_2d(
+            np.asarray(input_data_df, dtype=np.float64)
+        )
 
     def predict(self):
-        n = []
-        
-        n.append(self.input_data_df.iloc[-1])
-        
-        second_hightest_value = self.input_data_df.sort_values(
-            ascending=False
-        ).iloc[1]
-        n.append(second_hightest_value)
-        
-        difference = n[1] - n[0] 
-        n.append(n[1] + (difference / 2))
-        
-        difference = n[2] - n[1] 
-        n.append(n[2] + (difference / 4))
-        
-        n.pop(0)
-
-        # output_df = pd.DataFrame(
-        #     {"Values": n}, 
-        #     index=None
-        # )
-        # return output_df
-        return n
+        # One row of 3 predicted values per window
+        return _basic_prediction(self.windows)
  
 # class NumPyPredictor(Predictor):
 #     def __init__(self, x, y, degree=1):
@@ -0,0 +1,136 @@
+import argparse
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import main
+
+class MainTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_directory.cleanup)
+
+    def write_csv(self, content, name="TEST.csv"):
+        csv_path = os.path.join(self.temp_directory.name, name)
+        with open(csv_path, 'wb') as csv_file:
+            csv_file.write(content)
+        return csv_path
+
+    def build_rows(self, row_count, line_break=b"\n"):
+        return line_break.join(
+            f"TEST,{day + 1:02d}-09-2023,{100 + day}.5".encode()
+            for day in range(row_count)
+        )
+
+class CountRowsTest(MainTestCase):
+    def count_rows(self, content):
+        return main._count_rows(self.write_csv(content))
+
+    def test_final_newline(self):
+        self.assertEqual(self.count_rows(self.build_rows(3) + b"\n"), 3)
+
+    def test_no_final_newline(self):
+        self.assertEqual(self.count_rows(self.build_rows(3)), 3)
+
+    def test_trailing_blank_lines(self):
+        self.assertEqual(self.count_rows(self.build_rows(3) + b"\n\n \n\n"), 3)
+
+    def test_crlf_line_endings(self):
+        content = self.build_rows(3, line_break=b"\r\n") + b"\r\n\r\n"
+        self.assertEqual(self.count_rows(content), 3)
+
+    def test_empty_file(self):
+        self.assertEqual(self.count_rows(b""), 0)
+
+    def test_blank_only_file(self):
+        self.assertEqual(self.count_rows(b"\n \r\n\n"), 0)
+
+    def test_rows_split_across_chunks(self):
+        content = self.build_rows(5) + b"\n\n"
+        # Rows are 22 bytes long, so both sizes split rows across chunks,
+        # and 1 byte chunks also split the trailing blank lines
+        for chunk_size in (1, 7):
+            with mock.patch.object(main, "COUNT_ROWS_CHUNK_SIZE", chunk_size):
+                self.assertEqual(self.count_rows(content), 5)
+
+class ExtractStockDataSubsetTest(MainTestCase):
+    def assert_consecutive_windows(self, timestamp_windows, value_windows):
+        for (timestamps, values) in zip(timestamp_windows, value_windows):
+            first_day = int(values[0] - 100)
+            np.testing.assert_allclose(
+                values, np.arange(first_day, first_day + 10) + 100.5
+            )
+            self.assertEqual(
+                timestamps.tolist(),
+                [f"{day + 1:02d}-09-2023" for day in range(first_day, first_day + 10)]
+            )
+
+    def test_exactly_ten_rows(self):
+        csv_path = self.write_csv(self.build_rows(10) + b"\n")
+
+        (timestamp_windows, value_windows) = main.extract_stock_data_subset(
+            csv_path, main._count_rows(csv_path), window_count=3
+        )
+
+        self.assertEqual(value_windows.shape, (3, 10))
+        self.assert_consecutive_windows(timestamp_windows, value_windows)
+        np.testing.assert_allclose(value_windows[0], np.arange(10) + 100.5)
+
+    def test_small_read_chunks(self):
+        csv_path = self.write_csv(self.build_rows(30) + b"\n")
+
+        with mock.patch.object(main, "READ_CHUNK_ROWS", 3):
+            (timestamp_windows, value_windows) = main.extract_stock_data_subset(
+                csv_path, main._count_rows(csv_path), window_count=20
+            )
+
+        self.assertEqual(timestamp_windows.shape, (20, 10))
+        self.assert_consecutive_windows(timestamp_windows, value_windows)
+
+    def test_fewer_rows_than_counted(self):
+        # The blank line in the middle is counted but skipped by read_csv,
+        # so the only possible window comes back with 9 rows
+        csv_path = self.write_csv(self.build_rows(4) + b"\n\n" + self.build_rows(5))
+
+        self.assertIsNone(main.extract_stock_data_subset(
+            csv_path, main._count_rows(csv_path)
+        ))
+
+class ProcessOneTest(MainTestCase):
+    def test_invalid_last_timestamp_is_reported(self):
+        # 10 rows, so the only window ends on the malformed timestamp
+        csv_path = self.write_csv(
+            self.build_rows(9) + b"\nTEST,2023-09-10,110.5\n"
+        )
+
+        (success, message, prediction_csvs) = main.process_one(csv_path, "_suffix")
+
+        self.assertFalse(success)
+        self.assertIn("2023-09-10", message)
+        self.assertEqual(prediction_csvs, [])
+
+class ValidateArgumentsTest(MainTestCase):
+    def validate(self, data_directory_path):
+        return main._validate_arguments(argparse.Namespace(
+            input_file_count=1, window_count=1,
+            data_directory_path=data_directory_path
+        ))
+
+    def test_existing_directory_is_valid(self):
+        (valid, _) = self.validate(self.temp_directory.name)
+        self.assertTrue(valid)
+
+    def test_empty_path_is_rejected(self):
+        (valid, message) = self.validate("")
+        self.assertFalse(valid)
+        self.assertIn("Data directory not found", message)
+
+    def test_file_path_is_rejected(self):
+        (valid, _) = self.validate(self.write_csv(self.build_rows(10)))
+        self.assertFalse(valid)
+
+if __name__ == "__main__":
+    unittest.main()
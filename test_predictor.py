@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+
+from predictor import (
+    BasicPredictor, _basic_prediction, _basic_prediction_loop, _basic_prediction_numpy
+)
+
+class BasicPredictorTest(unittest.TestCase):
+    def test_second_highest_value(self):
+        prediction = BasicPredictor(
+            input_data_df=[1, 2, 3, 10, 5, 6, 7, 8, 9, 4]
+        ).predict()
+
+        np.testing.assert_allclose(prediction, [[9, 11.5, 12.125]])
+
+    def test_backends_agree_with_nan(self):
+        windows = np.tile([1, 2, 3, 10, 5, 6, 7, 8, 9, 4.], (10, 1))
+        np.fill_diagonal(windows, np.nan)
+
+        np.testing.assert_allclose(
+            _basic_prediction_numpy(windows), _basic_prediction_loop(windows)
+        )
+        np.testing.assert_allclose(
+            _basic_prediction_numpy(windows), _basic_prediction(windows)
+        )
+        np.testing.assert_allclose(
+            _basic_prediction_numpy(windows)[:, 0],
+            [9, 9, 9, 8, 9, 9, 9, 9, 8, 9]
+        )
+
+    def test_backends_agree_with_repeated_maximum(self):
+        windows = np.array([[5, 1, 5, 2, 3, 4, 0, 1, 2, 3.]])
+
+        np.testing.assert_allclose(
+            _basic_prediction_numpy(windows), _basic_prediction_loop(windows)
+        )
+        self.assertEqual(_basic_prediction_numpy(windows)[0, 0], 5)
+
+if __name__ == "__main__":
+    unittest.main()